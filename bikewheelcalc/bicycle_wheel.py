@@ -4,6 +4,73 @@ import numpy as np
 from warnings import warn
 
 
+def _spoke_k(n, b, K_e, K_t, out=None):
+    """Stiffness matrix of a single spoke with unit vector n, nipple offset b,
+    axial stiffness K_e and tension stiffness K_t.
+
+    Written out in scalar arithmetic, since NumPy call overhead dominates
+    for 3-vectors. If out is given, the matrix is written into it."""
+
+    nx, ny, nz = n
+
+    # e3 x b, where e3 is the rim axial vector
+    ex, ey = -b[1], b[0]
+
+    # k_f = K_e*outer(n, n) + K_t*(I - outer(n, n))
+    c = K_e - K_t
+    kxx = c*nx*nx + K_t
+    kyy = c*ny*ny + K_t
+    kzz = c*nz*nz + K_t
+    kxy = c*nx*ny
+    kxz = c*nx*nz
+    kyz = c*ny*nz
+
+    # Change in force applied by spoke due to rim rotation, phi
+    fx = kxx*ex + kxy*ey
+    fy = kxy*ex + kyy*ey
+    fz = kxz*ex + kyz*ey
+
+    # Change in torque applied by spoke due to rim rotation
+    t = ex*fx + ey*fy
+
+    k = ((kxx, kxy, kxz, fx),
+         (kxy, kyy, kyz, fy),
+         (kxz, kyz, kzz, fz),
+         (fx, fy, fz, t))
+
+    if out is None:
+        return np.array(k)
+
+    out[:] = k
+    return out
+
+
+def _sum_spoke_k(N_arr, e3xb, ne, ee, a, c):
+    """Sum of spoke stiffness matrices with k_f = a*outer(n, n) + c*I.
+
+    Args:
+        N_arr: spoke unit vectors (N, 3).
+        e3xb: rotation lever arms e3 x b (N, 3).
+        ne, ee: dot products n.(e3 x b) and (e3 x b).(e3 x b) (N,).
+        a, c: coefficients (N,) of outer(n, n) and I for each spoke.
+
+    Expanding k_f this way reduces every term to a matrix product over
+    spokes, so no per-spoke 3x3 matrices are formed."""
+
+    # Change in force and torque applied by spokes due to rim rotation, phi
+    dFdphi = (a*ne).dot(N_arr) + c.dot(e3xb)
+    dTdphi = a.dot(ne**2) + c.dot(ee)
+
+    k = np.zeros((4, 4))
+
+    k[0:3, 0:3] = (a*N_arr.T).dot(N_arr) + np.sum(c)*np.eye(3)
+    k[0:3, 3] = dFdphi
+    k[3, 0:3] = dFdphi
+    k[3, 3] = dTdphi
+
+    return k
+
+
 class Rim:
     'Rim definition.'
 
@@ -54,8 +121,8 @@ class Rim:
         I_rad = 2*(t*(h+t)**3)/12 + 2*((w-t)*t**3/12 + (w-t)*t*(h/2)**2)
         I_lat = 2*(t*(w+t)**3)/12 + 2*((h-t)*t**3/12 + (h-t)*t*(w/2)**2)
 
-        # Warping constant, closed thin-walled section
-        I_warp = I_warp
+        # Warping constant, negligible for a closed thin-walled section
+        I_warp = 0.
 
         r = cls(radius=radius, area=area,
                 I_rad=I_rad, I_lat=I_lat, J_tor=J_tor, I_warp=I_warp,
@@ -166,76 +233,84 @@ class Spoke:
         hub_pt: location of the hub eyelet as (R, theta, z)
     """
 
-    def calc_k(self, tension=True):
-        """Calculate matrix relating force and moment at rim due to the
-        spoke under a rim displacement (u,v,w) and rotation phi"""
-
-        n = self.n                   # spoke vector
-        e3 = np.array([0., 0., 1.])  # rim axial vector
+    @property
+    def inv_length(self):
+        'Reciprocal of the spoke length.'
 
-        K_e = self.EA / self.length
+        return 1./self.length
 
-        if tension:
-            K_t = self.tension / self.length
-        else:
-            K_t = 0.
+    @property
+    def EA_over_L(self):
+        'Axial stiffness of the spoke, EA/length.'
 
-        k_f = K_e*np.outer(n, n) + K_t*(np.eye(3) - np.outer(n, n))
+        return self.EA / self.length
 
-        # Change in force applied by spoke due to rim rotation, phi
-        dFdphi = k_f.dot(np.cross(e3, self.b).reshape((3, 1)))
+    @property
+    def T_over_L(self):
+        'Tension stiffness of the spoke, tension/length.'
 
-        # Change in torque applied by spoke due to rim rotation
-        dTdphi = np.cross(self.b, e3).dot(k_f).dot(np.cross(self.b, e3))
+        return self.tension / self.length
 
-        k = np.zeros((4, 4))
-
-        k[0:3, 0:3] = k_f
-        k[0:3, 3] = dFdphi.reshape((3))
-        k[3, 0:3] = dFdphi.reshape(3)
-        k[3, 3] = dTdphi
+    def calc_k(self, tension=True, out=None):
+        """Calculate matrix relating force and moment at rim due to the
+        spoke under a rim displacement (u,v,w) and rotation phi
 
-        return k
+        If out is given, the 4x4 matrix is written into it and returned."""
 
-    def calc_k_geom(self):
-        'Calculate the coefficient of the tension-dependent spoke stiffness matrix.'
+        # Return the previous result if the spoke has not changed
+        key = (tension, self.tension, self.length, self.EA,
+               self.n.tobytes(), self.b.tobytes())
+        if key == self._k_cache_key:
+            if out is None:
+                return self._k_cache.copy()
 
-        n = self.n
-        e3 = np.array([0., 0., 1.])
+            out[:] = self._k_cache
+            return out
 
-        k_f = (1./self.length) * (np.eye(3) - np.outer(n, n))
+        K_e = self.EA_over_L
+        K_t = self.T_over_L if tension else 0.
 
-        # Change in force applied by spoke due to rim rotation, phi
-        dFdphi = k_f.dot(np.cross(e3, self.b).reshape((3, 1)))
+        k = _spoke_k(self.n, self.b, K_e, K_t, out=out)
 
-        # Change in torque applied by spoke due to rim rotation
-        dTdphi = np.cross(self.b, e3).dot(k_f).dot(np.cross(self.b, e3))
+        self._k_cache = k.copy()
+        self._k_cache_key = key
 
-        k = np.zeros((4, 4))
+        return k
 
-        k[0:3, 0:3] = k_f
-        k[0:3, 3] = dFdphi.reshape((3))
-        k[3, 0:3] = dFdphi.reshape(3)
-        k[3, 3] = dTdphi
+    def calc_k_geom(self, out=None):
+        'Calculate the coefficient of the tension-dependent spoke stiffness matrix.'
 
-        return k
+        # k_f = (1/length)*(I - outer(n, n))
+        return _spoke_k(self.n, self.b, 0., self.inv_length, out=out)
 
-    def calc_mass(self):
-        'Return the spoke mass'
+    @property
+    def mass(self):
+        'Spoke mass, or None if the density is not specified.'
 
         if self.density is not None:
             return self.density * self.length * np.pi/4*self.diameter**2
         else:
             return None
 
-    def calc_rot_inertia(self):
-        'Return the spoke rotational inertia about its center-of-mass'
+    @property
+    def rot_inertia_local(self):
+        'Spoke rotational inertia about its center-of-mass, or None.'
 
         if self.density is not None:
-            return self.calc_mass()*(self.length*self.n[1])**2 / 12.
+            return self.mass*(self.length*self.n[1])**2 / 12.
         else:
             return None
 
+    def calc_mass(self):
+        'Return the spoke mass'
+
+        return self.mass
+
+    def calc_rot_inertia(self):
+        'Return the spoke rotational inertia about its center-of-mass'
+
+        return self.rot_inertia_local
+
     def calc_tension_change(self, d, a=0.):
         'Calculate change in tension given d=(u,v,w,phi) and a tightening adjustment a'
 
@@ -244,10 +319,9 @@ class Spoke:
             d = np.append(d, 0.)
 
         # u_n = u_s + phi(e_3 x b)
-        e3 = np.array([0., 0., 1.])
-        un = np.array([d[0], d[1], d[2]]) + d[3]*np.cross(e3, self.b)
+        un = np.array([d[0] - d[3]*self.b[1], d[1] + d[3]*self.b[0], d[2]])
 
-        return self.EA/self.length * (a - self.n.dot(un))
+        return self.EA_over_L * (a - self.n.dot(un))
 
     def __init__(self, rim_pt, hub_pt, diameter, young_mod, density=None):
         self.EA = np.pi / 4 * diameter**2 * young_mod
@@ -256,6 +330,10 @@ class Spoke:
         self.density = density
         self.tension = 0.
 
+        # Last result of calc_k() and the spoke state it was computed for
+        self._k_cache = None
+        self._k_cache_key = None
+
         self.rim_pt = rim_pt  # (R, theta, offset)
         self.hub_pt = hub_pt  # (R, theta, z)
 
@@ -291,8 +369,17 @@ class BicycleWheel:
     def reorder_spokes(self):
         'Ensure that spokes are ordered according to theta_rim'
 
-        a = np.argsort([s.rim_pt[1] for s in self.spokes])
-        self.spokes = [self.spokes[i] for i in a]
+        if len(self.spokes) <= 1:
+            return
+
+        thetas = np.fromiter((s.rim_pt[1] for s in self.spokes),
+                             dtype=np.float64, count=len(self.spokes))
+
+        if np.all(np.diff(thetas) >= 0):  # already sorted
+            return
+
+        a = np.argsort(thetas, kind='stable')
+        self.spokes = [self.spokes[i] for i in a.tolist()]
 
     def lace_radial(self, n_spokes, diameter, young_mod, offset=0.0, density=None):
         'Add spokes in a radial spoke pattern.'
@@ -300,41 +387,36 @@ class BicycleWheel:
         return self.lace_cross(n_spokes, 0, diameter=diameter, young_mod=young_mod,
                                offset=offset, density=density)
 
-    def lace_cross_nds(self, n_spokes, n_cross, diameter, young_mod, offset=0., density=None):
-        'Add spokes on the non-drive-side with n_cross crossings'
+    def _lace_cross_side(self, n_spokes, n_cross, theta_0, hub_pt_r, hub_pt_z,
+                         diameter, young_mod, offset, density):
+        'Add n_spokes spokes on one side, starting at theta_0 with a leading spoke.'
 
-        # Start with a leading spoke at theta=0, and alternate
-        for s in range(n_spokes):
-            theta_rim = 2*np.pi/n_spokes * s
-            s_dir = 2*((s + 1) % 2) - 1  # [1, -1, 1, ...]
+        s = np.arange(n_spokes)
+        s_dir = np.where(s % 2 == 0, 1, -1)  # [1, -1, 1, ...]
 
-            rim_pt = (self.rim.radius, theta_rim, offset)
-            hub_pt = (self.hub.diameter_nds/2,
-                      theta_rim + 2*np.pi/n_spokes*n_cross*s_dir,
-                      self.hub.width_nds)
+        theta_rim = 2*np.pi/n_spokes * s + theta_0
+        theta_hub = theta_rim + 2*np.pi/n_spokes*n_cross*s_dir
 
-            self.spokes.append(Spoke(rim_pt, hub_pt, diameter, young_mod, density=density))
+        self.spokes.extend(Spoke((self.rim.radius, t_r, offset), (hub_pt_r, t_h, hub_pt_z),
+                                 diameter, young_mod, density=density)
+                           for t_r, t_h in zip(theta_rim.tolist(), theta_hub.tolist()))
 
         self.reorder_spokes()
         return True
 
-    def lace_cross_ds(self, n_spokes, n_cross, diameter, young_mod, offset=0., density=None):
-        'Add spokes on the drive-side with n_cross crossings'
-
-        # Start with a leading spoke at theta=0, and alternate
-        for s in range(n_spokes):
-            theta_rim = 2*np.pi/n_spokes * (s + 0.5)
-            s_dir = 2*((s + 1) % 2) - 1  # [1, -1, 1, ...]
+    def lace_cross_nds(self, n_spokes, n_cross, diameter, young_mod, offset=0., density=None):
+        'Add spokes on the non-drive-side with n_cross crossings'
 
-            rim_pt = (self.rim.radius, theta_rim, -offset)
-            hub_pt = (self.hub.diameter_ds/2,
-                      theta_rim + 2*np.pi/n_spokes*n_cross*s_dir,
-                      -self.hub.width_ds)
+        return self._lace_cross_side(n_spokes, n_cross, 0.,
+                                     self.hub.diameter_nds/2, self.hub.width_nds,
+                                     diameter, young_mod, offset, density)
 
-            self.spokes.append(Spoke(rim_pt, hub_pt, diameter, young_mod, density=density))
+    def lace_cross_ds(self, n_spokes, n_cross, diameter, young_mod, offset=0., density=None):
+        'Add spokes on the drive-side with n_cross crossings'
 
-        self.reorder_spokes()
-        return True
+        return self._lace_cross_side(n_spokes, n_cross, np.pi/n_spokes,
+                                     self.hub.diameter_ds/2, -self.hub.width_ds,
+                                     diameter, young_mod, -offset, density)
 
     def lace_cross(self, n_spokes, n_cross, diameter, young_mod, offset=0.0, density=None):
         'Generate spokes in a "cross" pattern with n_cross crossings.'
@@ -361,12 +443,6 @@ class BicycleWheel:
             T_r = 2 * T_avg * np.abs(s_l.n[0]) /\
                 (np.abs(s_l.n[0]*s_r.n[1]) + np.abs(s_r.n[0]*s_l.n[1]))
 
-            for i in range(0, len(self.spokes), 2):
-                self.spokes[i].tension = T_l
-
-            for i in range(1, len(self.spokes), 2):
-                self.spokes[i].tension = T_r
-
         elif T_right is not None:  # Specify right-side tension
             T_r = T_right
             T_l = np.abs(s_r.n[0]/s_l.n[0]) * T_right
@@ -379,37 +455,183 @@ class BicycleWheel:
             raise TypeError('Must specify one of the following arguments: T_avg, T_left, or T_right.')
 
         # Apply tensions
-        for i in range(0, len(self.spokes), 2):
-            self.spokes[i].tension = T_l
+        t = np.empty(len(self.spokes))
+        t[0::2] = T_l
+        t[1::2] = T_r
 
-        for i in range(1, len(self.spokes), 2):
-            self.spokes[i].tension = T_r
+        self.tensions = t
 
-    def calc_kbar(self, tension=True):
-        'Calculate smeared-spoke stiffness matrix'
+    @property
+    def tensions(self):
+        """Spoke tensions, in the order of self.spokes.
 
-        k_bar = np.zeros((4, 4))
+        The array is gathered from the spokes on every access and is
+        read-only. Assign a new array to set the tension of every spoke."""
 
-        for s in self.spokes:
-            k_bar = k_bar + s.calc_k(tension=tension)/(2*np.pi*self.rim.radius)
+        t = np.fromiter((s.tension for s in self.spokes),
+                        dtype=np.float64, count=len(self.spokes))
+        t.flags.writeable = False
 
-        return k_bar
+        return t
 
-    def calc_kbar_geom(self):
-        'Calculate smeared-spoke stiffness matrix, geometric component'
+    @tensions.setter
+    def tensions(self, t):
+        t = np.asarray(t, dtype=np.float64)
+        if t.shape != (len(self.spokes),):
+            raise ValueError('Must specify exactly one tension per spoke.')
 
-        k_bar = np.zeros((4, 4))
+        for s, t_s in zip(self.spokes, t.tolist()):
+            s.tension = t_s
 
-        # Get scaling factor for tension on each side of the wheel
-        s_0 = self.spokes[0]
-        s_1 = self.spokes[1]
-        T_d = np.abs(s_0.n[0]*s_1.n[1]) + np.abs(s_1.n[0]*s_0.n[1])
+    @property
+    def inv_lengths(self):
+        'Reciprocal spoke lengths, in the order of self.spokes.'
 
-        for s in self.spokes:
-            k_bar = k_bar + \
-                np.abs(s.n[0])/T_d * s.calc_k_geom()/(np.pi*self.rim.radius)
+        self._update_spoke_arrays()
+        return self._inv_lengths
+
+    def _update_spoke_arrays(self):
+        'Rebuild the packed spoke arrays if the spokes have changed.'
+
+        if (self._spoke_arrays is None or
+                len(self._packed_spokes) != len(self.spokes) or
+                any(p is not s or n is not s.n or b is not s.b or rim_pt is not s.rim_pt or
+                    EA != s.EA or length != s.length
+                    for (p, n, b, rim_pt, EA, length), s in zip(self._packed_spokes, self.spokes))):
+
+            self._packed_spokes = [(s, s.n, s.b, s.rim_pt, s.EA, s.length) for s in self.spokes]
+
+            N_arr = np.array([s.n for s in self.spokes], dtype=np.float64).reshape((-1, 3))
+            B_arr = np.array([s.b for s in self.spokes], dtype=np.float64).reshape((-1, 3))
+            L = np.array([s.length for s in self.spokes], dtype=np.float64)
+            Ke = np.array([s.EA_over_L for s in self.spokes], dtype=np.float64)
+
+            self._inv_lengths = 1. / L
+
+            self._spoke_arrays = (N_arr, B_arr, Ke, L)
+            self._theta_arr = np.array([s.rim_pt[1] for s in self.spokes], dtype=np.float64)
+
+            # Invariant terms of the smeared stiffness, see _calc_kbar_terms()
+            self._kbar_terms = None
+
+            # Scaling factor for tension on each side of the wheel
+            if len(self.spokes) > 1:
+                self._T_d = np.abs(N_arr[0, 0]*N_arr[1, 1]) + np.abs(N_arr[1, 0]*N_arr[0, 1])
+            else:
+                self._T_d = None
+
+    def spoke_arrays(self):
+        """Return the spoke geometry as contiguous arrays, one row per spoke.
+
+        Returns (N_arr, B_arr, Ke, theta): spoke unit vectors (N, 3), nipple
+        offset vectors (N, 3), axial stiffness EA/length (N,), and rim angles
+        (N,). The arrays are cached by the wheel and must not be modified.
+        """
+
+        self._update_spoke_arrays()
+
+        N_arr, B_arr, Ke, L = self._spoke_arrays
+
+        return N_arr, B_arr, Ke, self._theta_arr
+
+    def calc_tension_scale(self):
+        """Return the tension scaling factor 2*|n_x|/T_d of each spoke.
+
+        T_d = |n0_x*n1_y| + |n1_x*n0_y| relates the tension on each side of
+        the wheel to the average radial tension. The factors are zero if the
+        wheel has fewer than two spokes."""
+
+        self._update_spoke_arrays()
+
+        N_arr = self._spoke_arrays[0]
+
+        if self._T_d is None:
+            return np.zeros(len(N_arr))
+
+        return 2*np.abs(N_arr[:, 0]) / self._T_d
+
+    def _pack_spoke_arrays(self):
+        """Return spoke properties as contiguous arrays, one row per spoke.
+
+        Returns (N_arr, B_arr, Ke, Kt, L): spoke unit vectors (N, 3), nipple
+        offset vectors (N, 3), axial stiffness EA/length (N,), tension
+        stiffness tension/length (N,), and spoke lengths (N,).
+
+        The geometric arrays, including the rim angle of each spoke in
+        self._theta_arr, are cached and only rebuilt when the spoke list
+        changes, or when the n, b, rim_pt, EA or length of a spoke is
+        reassigned. Tensions are gathered on every call.
+        """
+
+        self._update_spoke_arrays()
+
+        N_arr, B_arr, Ke, L = self._spoke_arrays
+
+        return N_arr, B_arr, Ke, self.tensions*self._inv_lengths, L
+
+    def _calc_kbar_terms(self):
+        """Return the parts of the smeared stiffness that depend only on the
+        spoke geometry, as (e3xb, ne, ee, k_sum_e, k_sum_geom): the rotation
+        lever arms e3 x b (N, 3), their dot products n.(e3 x b) and
+        (e3 x b).(e3 x b) (N,), the summed elastic stiffness (4, 4), and the
+        summed geometric stiffness with tensions scaled by |n_x|/T_d (4, 4).
+
+        The terms are cached until the packed spoke arrays are rebuilt, so
+        the caller must bring them up to date with _update_spoke_arrays()."""
 
-        return k_bar
+        if self._kbar_terms is None:
+            N_arr, B_arr, Ke, L = self._spoke_arrays
+
+            e3xb = np.column_stack((-B_arr[:, 1], B_arr[:, 0], np.zeros(len(B_arr))))
+
+            ne = np.einsum('si,si->s', N_arr, e3xb)
+            ee = np.einsum('si,si->s', e3xb, e3xb)
+
+            k_sum_e = _sum_spoke_k(N_arr, e3xb, ne, ee, Ke, np.zeros(len(Ke)))
+
+            # Tension scaling is undefined without both a left and a right spoke
+            if self._T_d is not None:
+                Kt_geom = np.abs(N_arr[:, 0]) / self._T_d * self._inv_lengths
+                k_sum_geom = _sum_spoke_k(N_arr, e3xb, ne, ee, -Kt_geom, Kt_geom)
+            else:
+                k_sum_geom = np.zeros((4, 4))
+
+            self._kbar_terms = (e3xb, ne, ee, k_sum_e, k_sum_geom)
+
+        return self._kbar_terms
+
+    def calc_kbar_all(self, tension=True):
+        """Calculate smeared-spoke stiffness matrix and its geometric component.
+
+        Returns (k_bar, k_bar_geom). Only the tension stiffness is summed on
+        each call; everything else depends on the spoke geometry alone and is
+        computed once per lacing.
+        """
+
+        N_arr, B_arr, Ke, Kt, L = self._pack_spoke_arrays()
+        e3xb, ne, ee, k_sum_e, k_sum_geom = self._calc_kbar_terms()
+
+        inv_rim_circ = 1./(2*np.pi*self.rim.radius)
+
+        if tension:
+            # k_f = (K_e - K_t)*outer(n, n) + K_t*I, split into cached and live parts
+            k_bar = (k_sum_e + _sum_spoke_k(N_arr, e3xb, ne, ee, -Kt, Kt)) * inv_rim_circ
+        else:
+            k_bar = k_sum_e * inv_rim_circ
+
+        return k_bar, k_sum_geom * (2*inv_rim_circ)
+
+    def calc_kbar(self, tension=True):
+        'Calculate smeared-spoke stiffness matrix'
+
+        return self.calc_kbar_all(tension=tension)[0]
+
+    def calc_kbar_geom(self):
+        'Calculate smeared-spoke stiffness matrix, geometric component'
+
+        self._update_spoke_arrays()
+
+        return self._calc_kbar_terms()[4] / (np.pi*self.rim.radius)
 
     def calc_mass(self):
         'Calculate total mass of the wheel in kilograms.'
@@ -419,12 +641,18 @@ class BicycleWheel:
             m_rim = 0.
             warn('Rim density is not specified.')
 
-        m_spokes = np.array([s.calc_mass() for s in self.spokes])
-        if np.any(m_spokes == None):
-            m_spokes = np.where(m_spokes == None, 0., m_spokes)
+        m_spokes, missing = 0., False
+        for s in self.spokes:
+            m = s.mass
+            if m is None:
+                missing = True
+            else:
+                m_spokes += m
+
+        if missing:
             warn('Some spoke densities are not specified.')
 
-        return m_rim + np.sum(m_spokes)
+        return m_rim + m_spokes
 
     def calc_rot_inertia(self):
         'Calculate rotational inertia about the hub axle.'
@@ -434,14 +662,19 @@ class BicycleWheel:
             I_rim = 0.
             warn('Rim density is not specified.')
 
-        I_spk = np.array([s.calc_rot_inertia() for s in self.spokes])
-        if np.any(I_spk == None):
+        I_spokes, missing = 0., False
+        for s in self.spokes:
+            m = s.mass
+            if m is None:
+                missing = True
+                break
+
+            # Inertia about the center-of-mass plus parallel-axis term
+            I_spokes += s.rot_inertia_local + m*(0.5*(s.hub_pt[0] + s.rim_pt[0]))**2
+
+        if missing:
             I_spokes = 0.
             warn('Some spoke densities are not specified.')
-        else:
-            mr2_spk = np.array([s.calc_mass()*(0.5*(s.hub_pt[0] + s.rim_pt[0]))**2
-                                for s in self.spokes])
-            I_spokes = np.sum(I_spk) + np.sum(mr2_spk)
 
         return I_rim + I_spokes
 
@@ -449,3 +682,11 @@ class BicycleWheel:
         self.spokes = []
         self.rim = None
         self.hub = None
+
+        # Cached spoke arrays, see _pack_spoke_arrays()
+        self._spoke_arrays = None
+        self._packed_spokes = []
+        self._theta_arr = None
+        self._inv_lengths = None
+        self._T_d = None
+        self._kbar_terms = None
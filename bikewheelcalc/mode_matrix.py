@@ -157,14 +157,14 @@ class ModeMatrix:
 
         else:  # Fully-discrete spokes
 
-            # Get scaling factor for tension on each side of the wheel
-            s_0 = self.wheel.spokes[0]
-            s_1 = self.wheel.spokes[1]
-            T_d = np.abs(s_0.n[0]*s_1.n[1]) + np.abs(s_1.n[0]*s_0.n[1])
+            # Scaling factor for tension on each side of the wheel
+            c_T = self.wheel.calc_tension_scale()
 
-            for s in self.wheel.spokes:
+            k = np.empty((4, 4))  # scratch buffer for spoke stiffness
+
+            for s, c in zip(self.wheel.spokes, c_T.tolist()):
                 B = self.B_theta(s.rim_pt[1])
-                K_spk = K_spk + 2*np.abs(s.n[0])/T_d * B.T.dot(s.calc_k_geom().dot(B))
+                K_spk += c * B.T.dot(s.calc_k_geom(out=k).dot(B))
 
         return K_spk
 
@@ -173,8 +173,8 @@ class ModeMatrix:
 
         K_rim = self.K_rim_matl(r0=r0)
         if tension:
-            T_avg = np.sum([s.tension*s.n[1]/len(self.wheel.spokes)
-                            for s in self.wheel.spokes])
+            N_arr = self.wheel.spoke_arrays()[0]
+            T_avg = self.wheel.tensions.dot(N_arr[:, 1]) / len(self.wheel.spokes)
             K_rim = K_rim - T_avg*self.K_rim_geom(r0=r0)
 
         return K_rim
@@ -198,9 +198,11 @@ class ModeMatrix:
 
         else:  # Fully-discrete spokes
 
+            k = np.empty((4, 4))  # scratch buffer for spoke stiffness
+
             for s in self.wheel.spokes:
                 B = self.B_theta(s.rim_pt[1])
-                K_spk = K_spk + B.T.dot(s.calc_k(tension=tension).dot(B))
+                K_spk += B.T.dot(s.calc_k(tension=tension, out=k).dot(B))
 
         return K_spk
 
@@ -215,16 +217,15 @@ class ModeMatrix:
     def A_adj(self):
         'Calculate spoke adjustment matrix.'
 
-        e3 = np.array([0., 0., 1.])  # rim axial vector
+        N_arr, B_arr, Ke, theta = self.wheel.spoke_arrays()
 
-        A = np.zeros((4 + self.n_modes*8, len(self.wheel.spokes)))
+        # Force and moment on the rim per unit adjustment, (n, e3.(b x n))
+        f = Ke[:, None] * np.column_stack((N_arr, B_arr[:, 0]*N_arr[:, 1] -
+                                           B_arr[:, 1]*N_arr[:, 0]))
 
-        for i, s in enumerate(self.wheel.spokes):
-            b = np.array([s.rim_pt[2], 0., 0.])
-            A[:, i] = s.EA/s.length * self.B_theta(s.rim_pt[1]).T\
-                .dot(np.append(s.n, e3.dot(np.cross(s.b, s.n))))
+        B = self.B_theta(theta).reshape((len(f), 4, -1))
 
-        return A
+        return np.einsum('sc,scd->ds', f, B)
 
 
     def get_ix_uncoupled(self, dim='lateral'):
@@ -271,13 +272,19 @@ class ModeMatrix:
     def spoke_tension_change(self, dm, a=None):
         'Return a vector of tension changes for each spoke.'
 
+        N_arr, B_arr, Ke, theta = self.wheel.spoke_arrays()
+
         if a is None:
-            a = np.zeros(self.n_spokes)
+            a = np.zeros(len(N_arr))
+
+        # Rim displacement and rotation at each spoke nipple
+        d = self.B_theta(theta).dot(dm).reshape((-1, 4))
 
-        dT = [s.calc_tension_change(self.B_theta(s.rim_pt[1]).dot(dm), adj)
-              for s, adj in zip(self.wheel.spokes, a)]
+        # u_n = u_s + phi(e_3 x b)
+        un = d[:, 0:3] + d[:, 3:4]*np.column_stack((-B_arr[:, 1], B_arr[:, 0],
+                                                     np.zeros(len(B_arr))))
 
-        return np.array(dT)
+        return Ke * (a - np.einsum('si,si->s', N_arr, un))
 
     def __init__(self, wheel, N=10):
 
@@ -50,9 +50,9 @@ def calc_buckling_tension(wheel, approx='linear', N=20):
     EIw = wheel.rim.young_mod * wheel.rim.I_warp
     GJ = wheel.rim.shear_mod * wheel.rim.J_tor
 
-    kbar = wheel.calc_kbar(tension=False)
+    kbar, kbar_geom = wheel.calc_kbar_all(tension=False)
     kuu, kup, kpp = (kbar[0, 0], kbar[0, 3], kbar[3, 3])
-    kT = (2*pi*R/ns)*wheel.calc_kbar_geom()[0, 0]
+    kT = (2*pi*R/ns)*kbar_geom[0, 0]
 
     if approx == 'linear':
         T_cn = [calc_Tc_mode_lin(n) for n in range(2, N+1)]
@@ -1,9 +1,26 @@
 import pytest
 import warnings
+import copy
 import numpy as np
 from bikewheelcalc import BicycleWheel, Rim, Hub
 
 
+# -----------------------------------------------------------------------------
+# Rim tests
+# -----------------------------------------------------------------------------
+
+def test_rim_box():
+    'Initialize a rim with a box cross-section'
+
+    r = Rim.box(radius=0.3, w=0.02, h=0.01, t=0.001,
+                young_mod=69e9, shear_mod=26e9)
+
+    assert r.sec_type == 'box'
+    assert r.sec_params['closed']
+    assert r.I_warp == 0.
+    assert np.allclose(r.J_tor, 2*0.001*(0.02*0.01)**2 / (0.02 + 0.01))
+
+
 # -----------------------------------------------------------------------------
 # Hub tests
 # -----------------------------------------------------------------------------
@@ -82,6 +99,56 @@ def test_calc_k_geom(std_ncross):
     assert np.allclose(s.calc_k(tension=True),
                        s.calc_k(tension=False) + s.tension*s.calc_k_geom())
 
+def test_calc_k_cache(std_ncross):
+    'Check that cached calc_k() results follow changes in spoke tension'
+
+    w = std_ncross(3)
+    s = w.spokes[0]
+
+    k_0 = s.calc_k(tension=True)
+    k_0[:] = 0.  # modifying the result must not corrupt the cache
+
+    w.apply_tension(100.)
+    k_T = s.calc_k(tension=True)
+
+    assert np.allclose(s.calc_k(tension=False) + s.tension*s.calc_k_geom(), k_T)
+    assert np.allclose(s.calc_k(tension=True), k_T)
+    assert not np.allclose(k_T, 0.)
+
+def test_calc_k_change_EA(std_ncross):
+    'Check that calc_k() and calc_kbar() follow a change in spoke EA'
+
+    w = std_ncross(3)
+    w.apply_tension(100.)
+    s = w.spokes[0]
+
+    k = s.calc_k(tension=False)
+    kbar = w.calc_kbar(tension=False)
+
+    for s_i in w.spokes:
+        s_i.EA *= 2
+
+    assert np.allclose(s.calc_k(tension=False), 2.*k)
+    assert np.allclose(w.calc_kbar(tension=False), 2.*kbar)
+    assert np.allclose(s.calc_tension_change([0., 0., 0., 0.], a=0.001),
+                       s.EA/s.length*0.001)
+
+def test_calc_k_out(std_ncross):
+    'Check that calc_k() and calc_k_geom() write into a preallocated array'
+
+    w = std_ncross(3)
+    w.apply_tension(100.)
+    s = w.spokes[0]
+
+    k = np.empty((4, 4))
+
+    for tension in [True, False, True]:  # second True call is cached
+        assert s.calc_k(tension=tension, out=k) is k
+        assert np.allclose(k, s.calc_k(tension=tension))
+
+    assert s.calc_k_geom(out=k) is k
+    assert np.allclose(k, s.calc_k_geom())
+
 def test_calc_kbar_geom(std_ncross):
     'Check that calc_kbar() and calc_kbar_geom() are consistent'
 
@@ -91,6 +158,51 @@ def test_calc_kbar_geom(std_ncross):
     assert np.allclose(w.calc_kbar(tension=True),
                        w.calc_kbar(tension=False) + 100.*w.calc_kbar_geom())
 
+@pytest.mark.parametrize('tension', [True, False])
+def test_calc_kbar_sum_calc_k(std_ncross, tension):
+    'Check that calc_kbar() is the smeared sum of Spoke.calc_k()'
+
+    w = std_ncross(3)
+    w.lace_cross(n_spokes=36, n_cross=3, diameter=1.8e-3, young_mod=210e9, offset=0.01)
+    w.apply_tension(100.)
+
+    kbar = sum(s.calc_k(tension=tension) for s in w.spokes) / (2*np.pi*0.3)
+
+    assert np.allclose(w.calc_kbar(tension=tension), kbar)
+
+    # Re-lacing the wheel must not return stale spoke data
+    w.lace_radial(n_spokes=36, diameter=1.8e-3, young_mod=210e9, offset=0.)
+    w.apply_tension(100.)
+
+    kbar = sum(s.calc_k(tension=tension) for s in w.spokes) / (2*np.pi*0.3)
+
+    assert np.allclose(w.calc_kbar(tension=tension), kbar)
+
+    # Neither must changing the properties of a spoke
+    w.spokes[0].b = np.array([0.01, 0., 0.])
+    w.spokes[1].EA *= 2
+
+    kbar = sum(s.calc_k(tension=tension) for s in w.spokes) / (2*np.pi*0.3)
+
+    assert np.allclose(w.calc_kbar(tension=tension), kbar)
+
+def test_calc_kbar_new_rim(std_ncross):
+    'Check that calc_kbar() follows a change of rim'
+
+    w = std_ncross(3)
+    kbar = w.calc_kbar(tension=False)
+
+    w.rim = Rim(radius=0.6, area=100e-6,
+                I_lat=200./69e9, I_rad=100./69e9, J_tor=25./26e9, I_warp=0.0,
+                young_mod=69e9, shear_mod=26e9)
+
+    assert np.allclose(w.calc_kbar(tension=False), 0.5*kbar)
+
+    # Changing the radius in place must also be picked up
+    w.rim.radius = 0.15
+
+    assert np.allclose(w.calc_kbar(tension=False), 2.*kbar)
+
 @pytest.mark.parametrize('n_cross', [0, 1, 2, 3])
 def test_calc_kbar_symm_nooffset(std_ncross, n_cross):
     'Compare kbar for radial spokes against theory'
@@ -206,6 +318,60 @@ def test_apply_tension_none(std_ncross):
     with pytest.raises(TypeError):
         w.apply_tension()
 
+def test_spoke_arrays(std_ncross):
+    'Check that the packed spoke arrays follow the spokes'
+
+    w = std_ncross(3)
+
+    N_arr, B_arr, Ke, theta = w.spoke_arrays()
+
+    assert np.allclose(N_arr, [s.n for s in w.spokes])
+    assert np.allclose(B_arr, [s.b for s in w.spokes])
+    assert np.allclose(Ke, [s.EA/s.length for s in w.spokes])
+    assert np.allclose(theta, [s.rim_pt[1] for s in w.spokes])
+
+    # Moving a spoke nipple is seen by the wheel
+    w.spokes[0].rim_pt = (0.3, 0.5, 0.)
+    assert w.spoke_arrays()[3][0] == 0.5
+
+def test_tensions_array(std_ncross):
+    'Check that the wheel tensions array follows the spoke tensions'
+
+    w = std_ncross(3)
+    w.apply_tension(T_left=100.)
+
+    assert np.allclose(w.tensions, [s.tension for s in w.spokes])
+
+    # Writing to a spoke is seen by the wheel
+    w.spokes[2].tension = 50.
+    assert w.tensions[2] == 50.
+    assert np.allclose(w.calc_kbar(), sum(s.calc_k() for s in w.spokes)/(2*np.pi*0.3))
+
+    # Assigning the wheel array sets the spoke tensions
+    w.tensions = np.arange(36.)
+    assert w.spokes[2].tension == 2.
+
+    with pytest.raises(ValueError):
+        w.tensions[0] = 1.
+
+    with pytest.raises(ValueError):
+        w.tensions = np.zeros(35)
+
+    # A copy of a spoke does not share its tension
+    s = copy.copy(w.spokes[0])
+    s.tension = 1.
+    assert w.spokes[0].tension == 0.
+
+    # Spokes shared between wheels share their tension
+    w2 = BicycleWheel()
+    w2.rim = w.rim
+    w2.spokes = list(w.spokes)
+    w2.apply_tension(T_left=150.)
+
+    assert w.spokes[0].tension == 150.
+    assert np.allclose(w.tensions, w2.tensions)
+    assert np.allclose(w.calc_kbar(), w2.calc_kbar())
+
 
 # -----------------------------------------------------------------------------
 # Spoke lacing geometry tests
@@ -304,6 +470,15 @@ def test_mass_spokes_only():
 
     assert np.allclose(m_wheel, 36.*m_spk)
 
+    # Spoke densities given after lacing are also used
+    for s in w.spokes:
+        s.density = 2.0
+
+    with pytest.warns(UserWarning):
+        m_wheel = w.calc_mass()
+
+    assert np.allclose(m_wheel, 72.*m_spk)
+
 def test_I_rim_only():
     'Check that wheel inertia returns rim inertia if no spoke density is given'
 
@@ -139,3 +139,22 @@ def test_spoke_tension(std_ncross):
     # Check all others are zero
     assert np.allclose(dT[:5], 0.)
     assert np.allclose(dT[6:], 0.)
+
+def test_spoke_tension_offset(std_ncross):
+    'Check spoke tension changes and adjustments for offset spoke nipples'
+
+    w = std_ncross(3)
+    w.lace_cross(n_spokes=36, n_cross=3, diameter=1.8e-3, young_mod=210e9, offset=0.01)
+    mm = ModeMatrix(w, N=10)
+
+    dm = np.random.RandomState(0).rand(4 + 8*10)
+    a = 0.001*np.arange(len(w.spokes))
+
+    dT = mm.spoke_tension_change(dm, a)
+    dT_s = [s.calc_tension_change(mm.B_theta(s.rim_pt[1]).dot(dm), a_s)
+            for s, a_s in zip(w.spokes, a)]
+
+    assert np.allclose(dT, dT_s)
+
+    # Adjustment matrix is consistent with tension change due to deformation
+    assert np.allclose(mm.A_adj().T.dot(dm), -mm.spoke_tension_change(dm))